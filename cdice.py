@@ -13,14 +13,17 @@ See also: Conway's Custom Romanisation for Cantonese
 """
 
 
-import itertools
-import re
+import functools
 
 
 # List of dice rolls (7776)
 
-DICE_ROLLS = itertools.product('123456', repeat=5)
-DICE_ROLLS = ["".join(d) for d in DICE_ROLLS]
+# Roll n is the 5-digit base-6 representation of n, with digits 1 to 6.
+
+DICE_ROLLS = [
+  "".join("123456"[n // 6 ** k % 6] for k in range(4, -1, -1))
+    for n in range(6 ** 5)
+]
 
 
 # List of initials (24) in Conway's Custom Romanisation
@@ -39,7 +42,7 @@ INITIALS = ("""\
   ts ts' ch ch' s sh y
   r
   """
-)
+).split()
 
 
 # List of finals (60) in Conway's Custom Romanisation
@@ -63,7 +66,7 @@ FINALS = ("""\
   ue uen uet
   m ng
   """
-)
+).split()
 
 
 # List of pitches (6)
@@ -71,7 +74,27 @@ FINALS = ("""\
 # I only refer to pitches as tones after entering tones have been canonicalised
 # as tones 7, 8 and 9.
 
-PITCHES = " ".join(map(str, range(1, 1 + 6)))
+PITCHES = [str(pitch) for pitch in range(1, 1 + 6)]
+
+
+# Pure nasal finals (m and ng), which take the null initial only
+
+PURE_NASAL_FINALS = frozenset(("m", "ng"))
+
+
+# Deletion table for rendering syllables,
+# stripping null initial markers ? (and any stray separators |)
+
+MARKER_DELETION_TABLE = str.maketrans("", "", "?|")
+
+
+# Canonical entering tones (7, 8 and 9) for the pitches 1, 3 and 6
+
+ENTERING_TONE_CANONICALISATIONS = {
+  "1": "7",
+  "3": "8",
+  "6": "9"
+}
 
 
 # List of all and non-Conway romanisation schemes
@@ -179,7 +202,7 @@ ROMANISATION_CONVERSIONS_DICTIONARY["sidney_lau"]["finals"] = """\
 # All non-Conway romanisations have 1, 3 and 6 for entering tones 7, 8 and 9
 
 for romanisation in NON_CONWAY_ROMANISATIONS:
-  
+
   ROMANISATION_CONVERSIONS_DICTIONARY[romanisation]["tones"] = """\
     7 1
     8 3
@@ -187,53 +210,60 @@ for romanisation in NON_CONWAY_ROMANISATIONS:
   """
 
 
-def convert_romanisation(romanisation, syllables):
-  """
-  Convert syllables in Conway romanisation to romanisation.
-  """
-  
+# Dictionary of romanisation conversion maps
+
+# The rules for each type are parsed into plain lookup dictionaries
+# at import time; since syllables are kept as (initial, final, pitch)
+# tuples, each component converts with a single dictionary lookup
+# (no regex at all).
+
+ROMANISATION_CONVERSIONS_MAPS = {}
+
+for romanisation in NON_CONWAY_ROMANISATIONS:
+
+  ROMANISATION_CONVERSIONS_MAPS[romanisation] = {}
+
   for type in ROMANISATION_CONVERSIONS_DICTIONARY[romanisation]:
-    
+
     rules = ROMANISATION_CONVERSIONS_DICTIONARY[romanisation][type]
     rules = rules.split()
-    
-    # Entries 0, 2, 4, etc. are patterns
-    patts = rules[0::2]
-    
-    # Entries 1, 3, 5, etc. are replacements
-    repls = rules[1::2]
-    
-    # Make patterns and replacements unambiguous (using | separator)
-    if type == "initials":
-      patts = ["^" + p + "[|]" for p in patts]
-      repls = [r + "|" for r in repls]
-    elif type == "finals":
-      patts = ["[|]" + p + "[|]" for p in patts]
-      repls = ["|" + r + "|" for r in repls]
-    
-    # Perform replacements
-    for p, r in zip(patts, repls):
-      syllables = regex_replace(p, r, syllables)
-    
-  return syllables
 
+    # Entries 0, 2, 4, etc. are patterns;
+    # entries 1, 3, 5, etc. are replacements
+    ROMANISATION_CONVERSIONS_MAPS[romanisation][type] = (
+      dict(zip(rules[0::2], rules[1::2]))
+    )
 
 
-def regex_remove(patt, string, count=0):
+@functools.lru_cache(maxsize=8)
+def convert_romanisation(romanisation, syllables):
   """
-  Replace a regex pattern with the empty string.
+  Convert syllables in Conway romanisation to romanisation.
+
+  Since conversion is pure, results are cached: syllables must be
+  a tuple of (initial, final, pitch) tuples, and repeated calls
+  with the same arguments are free.
   """
-  
-  return regex_replace(patt, "", string, count=count)
 
+  initials_map = ROMANISATION_CONVERSIONS_MAPS[romanisation]["initials"]
+  finals_map = ROMANISATION_CONVERSIONS_MAPS[romanisation]["finals"]
+  tones_map = ROMANISATION_CONVERSIONS_MAPS[romanisation]["tones"]
+
+  return tuple(
+    (initials_map.get(i, i), finals_map.get(f, f), tones_map.get(p, p))
+      for (i, f, p) in syllables
+  )
 
 
-def regex_replace(patt, repl, string, count=0):
+
+def render_syllable(syllable):
   """
-  Replace a regex pattern with a replacement (multiline mode).
+  Render a syllable tuple as a string.
+
+  Null initial markers ? are stripped.
   """
-  
-  return re.sub(patt, repl, string, count=count, flags=re.MULTILINE)
+
+  return "".join(syllable).translate(MARKER_DELETION_TABLE)
 
 
 
@@ -243,48 +273,67 @@ def main():
   # Generate all syllables in Conway's Custom Romanisation
   # ----------------------------------------------------------------
   
-  # Take Cartesian product of the lists of initials, finals and pitches
-  conway_syllables = itertools.product(
-    *[component.split() for component in [INITIALS, FINALS, PITCHES]]
-  )
+  # Take Cartesian product of the lists of initials, finals and pitches,
+  # keeping each syllable as a tuple (initial, final, pitch)
+  conway_syllables = [
+    (i, f, p)
+      for i in INITIALS
+      for f in FINALS
+      for p in PITCHES
+  ]
   # (8640 syllables)
-  
-  # Join each combination using | as the separator
-  conway_syllables = ["|".join(s) for s in conway_syllables]
-  
-  # Put them into a newline-separated string
-  conway_syllables = "\n".join(conway_syllables)
-  
+
   # ----------------------------------------------------------------
   # Filter unpronounceable syllables
   # ----------------------------------------------------------------
-  
+
   # Remove all syllables with
   # non-null initial (not ?) and pure nasal final (m or ng)
-  conway_syllables = regex_remove("^[^?|]+[|](?:m|ng)[|].$", conway_syllables)
+  conway_syllables = [
+    (i, f, p)
+      for (i, f, p) in conway_syllables
+      if i == "?" or f not in PURE_NASAL_FINALS
+  ]
   # (8364 syllables)
-  
+
   # Remove entering tones vernacularised as tone 5
-  conway_syllables = regex_remove("^.+[ptk][|]5$", conway_syllables)
+  conway_syllables = [
+    (i, f, p)
+      for (i, f, p) in conway_syllables
+      if f[-1] not in "ptk" or p != "5"
+  ]
   # (7884 syllables)
-  
+
   # ----------------------------------------------------------------
   # Reduce list down to 6 ** 5 == 7776 syllables
   # ----------------------------------------------------------------
-  
+
   # Remove entering tones vernacularised as tone 4
-  syllable_surplus = len(conway_syllables.split()) - 6 ** 5
-  conway_syllables = regex_remove("^.+[ptk][|]4$", conway_syllables, syllable_surplus)
+  # (dropping exactly the earliest such syllables, as many as are surplus)
+  syllable_surplus = len(conway_syllables) - 6 ** 5
+  tone_4_entering_indices = [
+    index
+      for index, (i, f, p) in enumerate(conway_syllables)
+      if f[-1] in "ptk" and p == "4"
+  ]
+  surplus_indices = set(tone_4_entering_indices[:syllable_surplus])
+  conway_syllables = [
+    s
+      for index, s in enumerate(conway_syllables)
+      if index not in surplus_indices
+  ]
   # (7776 syllables)
-  
+
   # ----------------------------------------------------------------
   # Canonicalise non-vernacularised entering tones
   # ----------------------------------------------------------------
-  
-  conway_syllables = regex_replace("([ptk][|])1", r"\g<1>7", conway_syllables)
-  conway_syllables = regex_replace("([ptk][|])3", r"\g<1>8", conway_syllables)
-  conway_syllables = regex_replace("([ptk][|])6", r"\g<1>9", conway_syllables)
-  
+
+  # (as a tuple, so that convert_romanisation can cache its results)
+  conway_syllables = tuple(
+    (i, f, ENTERING_TONE_CANONICALISATIONS.get(p, p) if f[-1] in "ptk" else p)
+      for (i, f, p) in conway_syllables
+  )
+
   # ----------------------------------------------------------------
   # Convert Conway's Custom Romanisation to other romanisations
   # ----------------------------------------------------------------
@@ -305,29 +354,23 @@ def main():
   for romanisation in ROMANISATIONS:
     
     syllables = syllables_dictionary[romanisation]
-    
-    # Remove null initial markers ?
-    syllables = regex_remove("[?]", syllables)
-    
-    # Remove separators |
-    syllables = regex_remove("[|]", syllables)
-    
-    # Sort
-    syllables = sorted(syllables.split())
-    
-    # Prefix with dice rolls
-    syllables = ["{} {}".format(d, s) for d, s in zip(DICE_ROLLS, syllables)]
-    
-    # Put into a newline-separated string
-    syllables = "\n".join(syllables) + "\n"
-    
-    # Output
+
+    # Sort by rendered syllable
+    # (NOT component-wise, which would order the apostrophed initials
+    # differently from the output column's ASCII ordering)
+    syllables = sorted(syllables, key=render_syllable)
+
+    # Output, prefixing each rendered syllable with a dice roll
     with open(
-      "cantonese-diceware-{}.txt".format(romanisation),
+      f"cantonese-diceware-{romanisation}.txt",
       "w",
-      encoding="utf-8"
+      encoding="utf-8",
+      buffering=1 << 16
     ) as output_file:
-      output_file.write(syllables)
+      output_file.writelines(
+        f"{d} {render_syllable(s)}\n"
+          for d, s in zip(DICE_ROLLS, syllables)
+      )
 
 if __name__ == "__main__":
   